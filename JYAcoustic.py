@@ -8,10 +8,18 @@ by J.Y.Zhang
 
 2025/10/28 初始版本
 2025/11/05 更新微孔管计算声阻抗
+2025/11/18 增加麦克风批量向量化求解
+2025/11/26 热点函数接入 JYProfile 耗时统计
+2025/11/28 A 计权极点改为首次调用时计算并缓存
+2025/11/30 增加设计参数的雅可比矩阵（前向自动微分）
 '''
 
+import functools
+
 import numpy as np
 
+import JYProfile as prof
+
 # 物理常数
 PI = np.pi  # 圆周率
 KB = 1.38064853e-23  # 玻尔兹曼常数 KB
@@ -73,7 +81,8 @@ def JN(R): return np.sqrt(4*KB*T0*R)  # 计算阻值下的 J-N 噪声密度
 A 计权计算
 参考 GB/T 3785.1-2010 / IEC 61672-1:2002
 '''
-def A_weight(f):
+@functools.lru_cache(maxsize=None)
+def _A_weight_poles():  # A 计权的极点频率，首次调用时计算并缓存
     D = np.sqrt(1/2)
     fr = 10**3   # 中心参考频率，该频率处计权值为0
     fL = 10**1.5   # C计权的低频截止频率
@@ -87,7 +96,11 @@ def A_weight(f):
     f2 = (3-np.sqrt(5))/2*fA
     f3 = (3+np.sqrt(5))/2*fA
     f4 = np.sqrt((-b+np.sqrt(b**2-4*c))/2)
-    
+    return fr, f1, f2, f3, f4
+
+@prof.timed()
+def A_weight(f):
+    fr, f1, f2, f3, f4 = _A_weight_poles()
     def CW(f): return dB(f4**2*f**2/(f**2+f1**2)/(f**2+f4**2))   # 公式6
     def AW(f): return CW(f) + dB(f**2/np.sqrt((f**2+f2**2)*(f**2+f3**2)))   # 公式7
     
@@ -166,6 +179,105 @@ class MIC:  # 麦克风参数类
     def N_BH(self, f): return np.abs(self.Z3(f)/self.Zm(f) * JN(self.BH.R))
     def N_total(self, f): return np.sqrt(self.N_AH(f)**2 + self.N_VH(f)**2 + self.N_BH(f)**2)
 
+PARA_NAMES = ["D_AH", "L_AH", "V_FC", "V_BC", "C_SD", "R_VH", "R_BH", "M_BH"]  # 设计参数名称
+
+# 由一行设计参数建立麦克风，参数依次为声孔直径（mm）、声孔长度（mm）、前腔体积（mm3）、后腔体积（mm3）、
+# 振膜声顺（fF）、泄气孔声阻尼（GΩ）、薄流层声阻尼（MΩ）、薄流层声质量（kH），进声孔阻抗取频率 f 处的值
+def MIC_from_paras(paras, f=1000):
+    D, L = paras[0]*1e-3, paras[1]*1e-3
+    return MIC(SD=AC(0, 0, paras[4]*1e-15),
+               AH=AC(Ra(f, D, L), Ma(f, D, L)), VH=AC(paras[5]*1e9), BH=AC(paras[6]*1e6, paras[7]*1e3),
+               FC=AC(0, 0, Ca(paras[2]*1e-9)), BC=AC(0, 0, Ca(paras[3]*1e-9)))
+
+'''
+麦克风频响及噪声特性批量求解 V1.1
+与 MIC 类的电路相同，以数组广播一次求解所有设计和频点
+'''
+# p 为 8 个设计参数（数组或 Dual），返回复灵敏度 H 和进声孔、泄气孔、背板孔三个噪声源在输出端的贡献
+def _mic_circuit(p, f):
+    w = omg(f)
+    D, L = p[0]*1e-3, p[1]*1e-3
+    C_FC, C_BC, C_SD = Ca(p[2]*1e-9), Ca(p[3]*1e-9), p[4]*1e-15
+    R_AH, R_VH, R_BH = Ra(f, D, L), p[5]*1e9, p[6]*1e6
+    Z_AH = R_AH + 1j*w*Ma(f, D, L)
+    Z_BH = R_BH + 1j*w*p[7]*1e3
+    Z0 = -1j/(w*C_SD) + Z_BH
+    Z1 = parallel(Z_AH, -1j/(w*C_FC))
+    Z2 = Z1 - 1j/(w*C_BC)
+    Z3 = Z2 + R_VH
+    Zm = 1j*w*parallel(C_SD, C_BC)*(Z0*Z3 + Z2*R_VH)
+    H = Z1*R_VH/Z_AH/Zm
+    return H, (H*JN(R_AH), Z2/Zm*JN(R_VH), Z3/Zm*JN(R_BH))
+
+# paras 为 (设计数, 8) 的设计参数，单位同 MIC_from_paras，返回 (设计数, 频点数) 的复灵敏度和总噪声
+@prof.timed()
+def MIC_batch(paras, freqs):
+    p = np.asarray(paras, dtype=float).T[:, :, None]  # (8, 设计数, 1)
+    f = np.asarray(freqs, dtype=float)[None, :]
+    H, X = _mic_circuit(p, f)
+    N = np.sqrt(sum(np.abs(x)**2 for x in X))
+    return H, N
+
+'''
+设计灵敏度（雅可比矩阵）
+以前向自动微分（对偶数）通过 _mic_circuit 一次求出所有设计、所有频点对 8 个参数的导数，
+与逐个参数有限差分重算相比只需一次求解，且没有截断误差
+'''
+class Dual:  # 对偶数，v 为值，d 为对各参数的导数（首维为参数，其余维与 v 广播）
+    def __init__(self, v, d): self.v, self.d = v, d
+    # 与常数运算时不生成零导数数组
+    def __add__(a, b):
+        if not isinstance(b, Dual): return Dual(a.v + b, a.d)
+        return Dual(a.v + b.v, a.d + b.d)
+    __radd__ = __add__
+    def __sub__(a, b):
+        if not isinstance(b, Dual): return Dual(a.v - b, a.d)
+        return Dual(a.v - b.v, a.d - b.d)
+    def __rsub__(a, b): return Dual(b - a.v, -a.d)
+    def __mul__(a, b):
+        if not isinstance(b, Dual): return Dual(a.v * b, a.d * b)
+        return Dual(a.v * b.v, a.d * b.v + a.v * b.d)
+    __rmul__ = __mul__
+    def __truediv__(a, b):
+        if not isinstance(b, Dual): return Dual(a.v / b, a.d / b)
+        v = a.v / b.v
+        return Dual(v, (a.d - v * b.d) / b.v)
+    def __rtruediv__(a, b):
+        v = b / a.v
+        return Dual(v, -v / a.v * a.d)
+    def __neg__(a): return Dual(-a.v, -a.d)
+    def __pow__(a, n): return Dual(a.v**n, n * a.v**(n-1) * a.d)  # 指数为常数
+    def sqrt(a):
+        v = np.sqrt(a.v)
+        return Dual(v, a.d / (2*v))
+    # numpy 数组在左侧参与运算或调用 np.sqrt 时转到对偶数运算
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != "__call__" or kwargs: return NotImplemented
+        if ufunc is np.sqrt: return inputs[0].sqrt()
+        if ufunc is np.negative: return -inputs[0]
+        a, b = inputs if len(inputs) == 2 else (None, None)
+        if ufunc is np.add: return b + a if isinstance(b, Dual) else a + b
+        if ufunc is np.multiply: return b * a if isinstance(b, Dual) else a * b
+        if ufunc is np.subtract: return b.__rsub__(a) if isinstance(b, Dual) else a - b
+        if ufunc is np.true_divide: return b.__rtruediv__(a) if isinstance(b, Dual) else a / b
+        if ufunc is np.power and not isinstance(b, Dual): return a ** b
+        return NotImplemented
+
+# 返回 (设计数, 8, 频点数) 的灵敏度（dB）、相位（rad）、总噪声（dB）对各设计参数的偏导数，参数单位同 MIC_from_paras
+@prof.timed()
+def MIC_jacobian(paras, freqs):
+    P = np.asarray(paras, dtype=float)
+    f = np.asarray(freqs, dtype=float)[None, :]
+    seeds = np.eye(8)[:, :, None, None]  # 第 i 个参数对自身的导数为 1
+    p = [Dual(P[:, i, None], seeds[i]) for i in range(8)]
+    H, X = _mic_circuit(p, f)
+    G = H.d / H.v  # d(ln H)
+    N2 = sum(np.abs(x.v)**2 for x in X)
+    dN2 = sum(2*np.real(np.conj(x.v) * x.d) for x in X)
+    k = 20 / np.log(10)
+    to_design_major = lambda J: np.moveaxis(np.broadcast_to(J, (8,) + H.v.shape), 0, 1)
+    return to_design_major(k*np.real(G)), to_design_major(np.imag(G)), to_design_major(k/2 * dN2 / N2)
+
 
 ''''''''''''''''''''''''''''''''''''
 def main():
@@ -0,0 +1,180 @@
+'''
+by J.Y.Zhang
+跨会话、跨进程的本地磁盘计算缓存
+Streamlit 的 session_state 只在单个浏览器标签页内有效，重连或重启服务后需要重新计算。本模块把麦克风仿真结果、
+计权数据和生成的音频等数组保存在服务器本地目录中，所有会话和工作进程共享：
+（1）键为输入内容的哈希，调用方应把空气条件（T0、p0）和代码版本（code_version）一并放入键中
+（2）SQLite 索引记录每个条目的大小和最近使用时间，数组以 .npz 文件保存，先写临时文件再原子替换
+（3）SQLite 使用 WAL 模式和忙等待超时，多个进程可同时读写
+（4）总大小超过上限时按最近最少使用淘汰，按命名空间统计命中和未命中次数
+
+目录和容量上限可由环境变量 JY_CACHE_DIR、JY_CACHE_MB 设置。
+
+用法：
+  cache = JYCache.default()
+  key = JYCache.key(para, freqs, ac.T0, ac.p0, JYCache.code_version(ac))
+  result = cache.fetch("mic", key, simulate, para)
+
+2025/12/06 初始版本
+'''
+
+import functools
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+CACHE_DIR = os.environ.get("JY_CACHE_DIR", os.path.join(tempfile.gettempdir(), "jy_acoustic_cache"))
+MAX_BYTES = int(os.environ.get("JY_CACHE_MB", 1024)) << 20  # 缓存总大小上限
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, namespace TEXT, size INTEGER, parts INTEGER, used REAL);
+CREATE INDEX IF NOT EXISTS entries_used ON entries (used);
+CREATE TABLE IF NOT EXISTS stats (namespace TEXT PRIMARY KEY, hits INTEGER DEFAULT 0, misses INTEGER DEFAULT 0);
+'''
+
+# 逐项写入哈希，数组按类型、形状和内容，列表和元组逐项递归，其余按 repr
+def _update(h, obj):
+    if isinstance(obj, np.ndarray):
+        obj = np.ascontiguousarray(obj)
+        h.update(f"array{obj.dtype.str}{obj.shape}".encode())
+        h.update(obj.tobytes())
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"seq{len(obj)}(".encode())
+        for item in obj: _update(h, item)
+        h.update(b")")
+    else:
+        h.update(f"{type(obj).__name__}:{obj!r};".encode())
+
+# 由输入内容计算缓存键
+def key(*parts):
+    h = hashlib.sha1()
+    _update(h, parts)
+    return h.hexdigest()
+
+# 模块源代码的哈希，作为代码版本放入键中，修改计算代码后旧结果自动失效
+@functools.lru_cache(maxsize=None)
+def code_version(module):
+    with open(module.__file__, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+class Cache:  # 磁盘缓存，SQLite 索引 + .npz 数组文件
+    def __init__(self, path=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.path, self.max_bytes = path, max_bytes
+        os.makedirs(path, exist_ok=True)
+        self._local = threading.local()  # SQLite 连接不能跨线程使用，每个线程一个
+        with self._db() as db:
+            db.executescript(SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.path, "index.sqlite"), timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA busy_timeout=30000")
+            self._local.db = db
+        return db
+
+    def _file(self, key): return os.path.join(self.path, key[:2], key + ".npz")
+
+    def _count(self, db, namespace, column):
+        db.execute("INSERT OR IGNORE INTO stats (namespace) VALUES (?)", (namespace,))
+        db.execute(f"UPDATE stats SET {column} = {column} + 1 WHERE namespace = ?", (namespace,))
+
+    # 读取条目，返回数组（或数组元组），不存在时返回 None
+    def get(self, namespace, key):
+        with self._db() as db:
+            row = db.execute("SELECT parts FROM entries WHERE key = ?", (key,)).fetchone()
+            value = None
+            if row is not None:
+                try:
+                    with np.load(self._file(key)) as z:
+                        value = tuple(z[f"arr_{i}"] for i in range(abs(row[0])))
+                    value = value[0] if row[0] < 0 else value
+                    db.execute("UPDATE entries SET used = ? WHERE key = ?", (time.time(), key))
+                except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):  # 文件已被其他进程淘汰或损坏（空文件、写了一半）
+                    db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._count(db, namespace, "hits" if value is not None else "misses")
+        return value
+
+    # 写入条目，value 为数组或数组元组
+    def put(self, namespace, key, value):
+        single = isinstance(value, np.ndarray)
+        arrays = (value,) if single else tuple(value)
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, *arrays)
+            f.flush()
+            os.fsync(f.fileno())  # 落盘后再替换，断电时不会在最终路径留下空文件
+        os.replace(tmp, path)  # 原子替换，读取方不会看到写了一半的文件
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                       (key, namespace, os.path.getsize(path), -1 if single else len(arrays), time.time()))
+        self.evict()
+
+    # 读取条目，未命中时调用 func(*args) 计算并写入
+    def fetch(self, namespace, key, func, *args):
+        value = self.get(namespace, key)
+        if value is None:
+            value = func(*args)
+            self.put(namespace, key, value)
+        return value
+
+    # 总大小超过上限时，按最近使用时间从旧到新删除，直到不超过上限
+    def evict(self):
+        with self._db() as db:
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes: return
+            victims = []
+            for key, size in db.execute("SELECT key, size FROM entries ORDER BY used"):
+                if total <= self.max_bytes: break
+                victims.append(key)
+                total -= size
+            db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in victims])
+        for key in victims:
+            try:
+                os.remove(self._file(key))
+            except FileNotFoundError:
+                pass
+
+    # 各命名空间的统计，每行为 (命名空间, 命中, 未命中, 条目数, 大小 MB)
+    def stats(self):
+        with self._db() as db:
+            rows = db.execute('''
+                SELECT s.namespace, s.hits, s.misses, COUNT(e.key), COALESCE(SUM(e.size), 0) / 1048576.0
+                FROM stats s LEFT JOIN entries e ON e.namespace = s.namespace
+                GROUP BY s.namespace ORDER BY s.namespace''').fetchall()
+        return rows
+
+    def clear(self):
+        with self._db() as db:
+            keys = [row[0] for row in db.execute("SELECT key FROM entries")]
+            db.execute("DELETE FROM entries")
+            db.execute("DELETE FROM stats")
+        for key in keys:
+            try:
+                os.remove(self._file(key))
+            except FileNotFoundError:
+                pass
+
+# 进程内共享的默认缓存
+@functools.lru_cache(maxsize=None)
+def default(): return Cache()
+
+# 在 Streamlit 页面中显示可折叠的缓存统计面板
+def panel(cache=None, title="计算缓存", expanded=False):
+    import pandas as pd
+    import streamlit as st
+    rows = (cache or default()).stats()
+    df = pd.DataFrame(rows, columns=["命名空间", "命中", "未命中", "条目数", "大小 (MB)"])
+    df.insert(3, "命中率", df["命中"] / (df["命中"] + df["未命中"]).where(lambda n: n > 0))
+    with st.expander(f":material/database: {title}", expanded=expanded):
+        st.dataframe(df, hide_index=True, column_config={
+            "命中率": st.column_config.NumberColumn(format="percent"),
+            "大小 (MB)": st.column_config.NumberColumn(format="%.2f")})
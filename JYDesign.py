@@ -0,0 +1,188 @@
+'''
+by J.Y.Zhang
+麦克风设计参数库
+每个设计为 NumPy 结构化数组中的一条记录（8 个 float32 设计参数 + 3 个 float32 派生指标，共 44 字节），
+百万级设计只占几十 MB。支持：
+（1）文本 / CSV 的批量解析导入（接受科学计数法），逐字段检查单位范围，记录无效行及原因
+（2）按字段的排序索引，区间查询（如后腔体积在 1.0 到 1.5 mm3 之间）为对数复杂度
+（3）派生指标 f0、Q、SNR 的按需计算和缓存
+
+2025/12/02 初始版本
+'''
+
+import io
+
+import numpy as np
+
+import JYAcoustic as ac
+
+# 字段 → (中文名, 单位, 合理范围)，超出范围视为单位错误
+FIELDS = {
+    "D_AH": ("声孔直径", "mm", (0.01, 5.0)),
+    "L_AH": ("声孔长度", "mm", (0.01, 5.0)),
+    "V_FC": ("前腔体积", "mm3", (1e-3, 100.0)),
+    "V_BC": ("后腔体积", "mm3", (1e-3, 1000.0)),
+    "C_SD": ("振膜声顺", "fF", (1e-2, 100.0)),
+    "R_VH": ("泄气孔声阻尼", "GΩ", (0.1, 1e5)),
+    "R_BH": ("薄流层声阻尼", "MΩ", (1.0, 1e5)),
+    "M_BH": ("薄流层声质量", "kH", (1e-2, 1e3)),
+}
+METRICS = ["f0", "Q", "SNR"]  # 谐振频率（Hz）、品质因数、1 Pa 参考下的 A 计权信噪比（dB）
+DTYPE = np.dtype([(name, np.float32) for name in ac.PARA_NAMES] + [(name, np.float32) for name in METRICS])
+LOW = np.array([FIELDS[name][2][0] for name in ac.PARA_NAMES])
+HIGH = np.array([FIELDS[name][2][1] for name in ac.PARA_NAMES])
+SNR_FREQS = np.logspace(np.log10(20), np.log10(20000), 200)  # 信噪比积分频点
+
+# 检查 (n, 8) 参数的单位范围，返回有效行的布尔掩码和无效行的原因
+def check(paras):
+    paras = np.asarray(paras, dtype=float).reshape(-1, 8)
+    bad = ~np.isfinite(paras) | (paras < LOW) | (paras > HIGH)
+    reasons = {}
+    for i in np.flatnonzero(bad.any(axis=1)):
+        j = np.flatnonzero(bad[i])[0]
+        name, unit, (low, high) = FIELDS[ac.PARA_NAMES[j]]
+        reasons[int(i)] = f"{name} = {paras[i, j]:g} {unit} 超出范围 [{low:g}, {high:g}]"
+    return ~bad.any(axis=1), reasons
+
+# 解析文本，每行 8 个以逗号分隔的数，返回 (n, 8) 有效参数、对应行号（从 0 开始）和 {行号: 无效原因}
+def parse(text):
+    rows, lines, errors = [], [], {}
+    for k, line in enumerate(text.splitlines()):
+        if not line.strip(): continue
+        items = line.split(',')
+        if len(items) != 8:
+            errors[k] = f"应有 8 个数，实际 {len(items)} 个"
+            continue
+        try:
+            rows.append([float(item) for item in items])
+            lines.append(k)
+        except ValueError:
+            errors[k] = "包含无法识别的数"
+    paras = np.array(rows, dtype=float).reshape(-1, 8)
+    valid, reasons = check(paras)
+    errors.update({lines[i]: reason for i, reason in reasons.items()})
+    return paras[valid], np.array(lines, dtype=np.int64)[valid], dict(sorted(errors.items()))
+
+# 分块读取设计 CSV（无表头，8 列），返回 (行号, 参数) 的迭代器，无效行被跳过
+# 按整行读入再拆分，行号与文件一致，列数不为 8 的行与 parse 一样被拒绝，不会截取前 8 列
+def read_csv(path, chunk=100_000):
+    import pandas as pd  # 只在读取 CSV 时需要
+    reader = pd.read_csv(path, header=None, names=["line"], sep="\x01", quoting=3, dtype=str,
+                         skip_blank_lines=False, chunksize=chunk)
+    for df in reader:
+        lines = df["line"].fillna("")
+        ok = (lines.str.count(",") == 7).to_numpy()
+        if not ok.any(): continue
+        rows = pd.read_csv(io.StringIO("\n".join(lines[ok])), header=None, names=ac.PARA_NAMES, quoting=3,
+                           skipinitialspace=True, skip_blank_lines=False)
+        paras = rows.apply(pd.to_numeric, errors="coerce").to_numpy(np.float64)
+        valid, _ = check(paras)
+        if valid.any():
+            yield df.index.to_numpy(np.int64)[ok][valid], paras[valid]
+
+# 派生指标：振膜与后腔串联顺性和薄流层声质量决定的 f0、Q，以及 A 计权信噪比
+def derived(paras):
+    p = np.asarray(paras, dtype=float).reshape(-1, 8)
+    C = ac.parallel(p[:, 4]*1e-15, ac.Ca(p[:, 3]*1e-9))
+    M, R = p[:, 7]*1e3, p[:, 6]*1e6
+    H, N = ac.MIC_batch(p, SNR_FREQS)
+    w = 10**(ac.A_weight(SNR_FREQS)/10)
+    N_A = np.sqrt(np.trapezoid(N**2 * w, SNR_FREQS, axis=1))
+    S_1k = np.abs(ac.MIC_batch(p, [1000])[0][:, 0])
+    return ac.f0(C, M), ac.Qm(C, M, R), ac.dB(S_1k / N_A)
+
+class DesignStore:  # 设计参数库
+    def __init__(self, records=None):
+        self.records = np.zeros(0, DTYPE) if records is None else np.asarray(records, DTYPE)
+        self._index = {}
+
+    def __len__(self): return len(self.records)
+    def __getitem__(self, rows): return self.records[rows]
+
+    # 追加设计，先检查单位范围，返回 {新行号: 无效原因}
+    def append(self, paras):
+        paras = np.asarray(paras, dtype=float).reshape(-1, 8)
+        valid, reasons = check(paras)
+        new = np.zeros(int(valid.sum()), DTYPE)
+        for j, name in enumerate(ac.PARA_NAMES):
+            new[name] = paras[valid, j]
+        for name in METRICS:
+            new[name] = np.nan  # 派生指标按需计算
+        self.records = np.concatenate([self.records, new])
+        self._index = {}
+        return reasons
+
+    @classmethod
+    def from_text(cls, text):
+        paras, _, errors = parse(text)
+        store = cls()
+        store.append(paras)
+        return store, errors
+
+    @classmethod
+    def from_csv(cls, path, chunk=100_000):
+        store = cls()
+        store.records = np.concatenate([np.zeros(0, DTYPE)] + [cls._records(paras) for _, paras in read_csv(path, chunk)])
+        return store
+
+    @staticmethod
+    def _records(paras):
+        rec = np.zeros(len(paras), DTYPE)
+        for j, name in enumerate(ac.PARA_NAMES):
+            rec[name] = paras[:, j]
+        for name in METRICS:
+            rec[name] = np.nan
+        return rec
+
+    # 导出为无表头 8 列 CSV，与仿真页和 mic_batch 的输入格式相同
+    def to_csv(self, path, chunk=100_000):
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(0, len(self), chunk):
+                np.savetxt(f, self.paras(slice(i, i + chunk)), delimiter=",", fmt="%.6g")
+
+    # (n, 8) float64 参数数组，用于仿真
+    def paras(self, rows=slice(None)):
+        rec = self.records[rows]
+        return np.stack([rec[name] for name in ac.PARA_NAMES], axis=-1).astype(np.float64)
+
+    # 字段的排序索引 (行号, 排序后的值)，首次查询时建立，追加数据后失效
+    def index(self, field):
+        if field not in self._index:
+            order = np.argsort(self.records[field], kind="stable")
+            self._index[field] = order, self.records[field][order]
+        return self._index[field]
+
+    # 区间查询，例如 query(V_BC=(1.0, 1.5), D_AH=(0.2, None))，返回升序的行号
+    # 先用各字段的排序索引求出候选数，从最少的字段取出候选行，再用其余条件过滤
+    # 按派生指标查询时先计算全部尚未计算的指标；NaN 排在索引末尾，不计入任何区间
+    def query(self, **ranges):
+        if not ranges: return np.arange(len(self))
+        if any(field in METRICS for field in ranges): self.metrics()
+        spans = {}
+        for field, (low, high) in ranges.items():
+            values = self.index(field)[1]
+            end = np.searchsorted(values, np.float32(np.nan), side="left")  # 第一个 NaN 的位置
+            lo = 0 if low is None else np.searchsorted(values[:end], np.float32(low), side="left")
+            hi = end if high is None else np.searchsorted(values[:end], np.float32(high), side="right")
+            spans[field] = (lo, hi)
+        first = min(spans, key=lambda field: spans[field][1] - spans[field][0])
+        rows = self.index(first)[0][slice(*spans[first])]
+        for field, (low, high) in ranges.items():
+            if field == first: continue
+            values = self.records[field][rows]
+            mask = np.ones(len(rows), bool)
+            if low is not None: mask &= values >= np.float32(low)
+            if high is not None: mask &= values <= np.float32(high)
+            rows = rows[mask]
+        return np.sort(rows)
+
+    # 读取派生指标，尚未计算的分块计算并写回缓存，返回 (len(rows),) 结构化数组
+    def metrics(self, rows=slice(None), chunk=5000):
+        rows = np.arange(len(self))[rows]
+        todo = rows[np.isnan(self.records["SNR"][rows])]
+        for i in range(0, len(todo), chunk):
+            part = todo[i:i + chunk]
+            for name, values in zip(METRICS, derived(self.paras(part))):
+                self.records[name][part] = values
+        if len(todo): self._index = {k: v for k, v in self._index.items() if k not in METRICS}
+        return self.records[METRICS][rows]
@@ -0,0 +1,58 @@
+'''
+by J.Y.Zhang
+后台计算任务管理
+页面把一组输入提交到共享的线程池，每个输入一个任务，页面按完成情况逐步显示结果；
+输入变化时取消旧任务，尚未开始的任务直接跳过。任务中的 JYProfile 记录写入任务组自己的 Recorder。
+
+2025/11/22 初始版本
+2025/12/10 可选记录每个任务的 cProfile
+'''
+
+import cProfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import JYProfile
+
+# 新建线程池，页面中应通过 st.cache_resource 在所有会话间共享
+def executor(workers=4): return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jy-job")
+
+class Job:  # 一组后台计算任务
+    # key 标识输入内容，func(item, *args) 在后台线程中执行，不能调用 Streamlit 接口
+    # profile 为 True 时每个任务单独记录 cProfile，结果在 profiles 中，可合并到页面的 cProfile 文件
+    def __init__(self, pool, key, func, items, *args, profile=False):
+        self.key, self.total = key, len(items)
+        self._cancelled = threading.Event()
+        self.recorder = JYProfile.Recorder()  # 后台任务的耗时记录，跨多次页面运行累计
+        self.profile, self.profiles = profile, []
+        self._lock = threading.Lock()
+        self.futures = [pool.submit(self._run, func, item, *args) for item in items]
+
+    def _run(self, func, item, *args):
+        if self._cancelled.is_set(): return None
+        if not self.profile:
+            with self.recorder.active():
+                return func(item, *args)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            with self.recorder.active():
+                return func(item, *args)
+        finally:
+            profiler.disable()
+            with self._lock:
+                self.profiles.append(profiler)
+
+    # 取消尚未完成的任务，已在运行的任务完成后结果被丢弃
+    def cancel(self):
+        self._cancelled.set()
+        for future in self.futures: future.cancel()
+
+    @property
+    def cancelled(self): return self._cancelled.is_set()
+    def finished(self): return sum(future.done() for future in self.futures)
+    def done(self): return self.finished() == self.total
+
+    # 已完成任务的 (序号, 结果)，按输入顺序排列，任务中的异常在这里抛出
+    def results(self):
+        return [(i, future.result()) for i, future in enumerate(self.futures) if future.done() and not future.cancelled()]
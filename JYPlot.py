@@ -0,0 +1,58 @@
+'''
+by J.Y.Zhang
+曲线绘图工具
+多条曲线先转为长表（频率, 设计, 数值），用一个 Altair 图表和颜色编码绘制，不再每条曲线单独一个图层；
+每条曲线在序列化前用 LTTB（Largest-Triangle-Three-Buckets）降采样到点数预算以内，保留峰谷形状，
+图表数据量只随设计数线性增长，与仿真频点数无关。
+
+2025/12/04 初始版本
+'''
+
+import numpy as np
+
+COLORS = ["#3b6291", "#943c39", "#779043", "#624c7c", "#388498", "#bf7334", "#3f6899", "#9c403d", "#7d9847", "#675083", "#3b8ba1", "#c97937"]
+
+# LTTB 降采样，x 为 (m,) 共用横坐标，y 为 (k, m) 的 k 条曲线，返回 (k, n) 保留点的序号
+# 各曲线共用分桶，逐桶对所有曲线同时计算三角形面积
+def lttb(x, y, n):
+    x = np.asarray(x, dtype=float)
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    k, m = y.shape
+    if n >= m or n < 3:
+        return np.broadcast_to(np.arange(m), (k, m))
+    edges = np.floor(np.linspace(1, m - 1, n - 1)).astype(int)  # 中间 m-2 个点分为 n-2 个桶
+    idx = np.empty((k, n), dtype=int)
+    idx[:, 0], idx[:, -1] = 0, m - 1
+    rows = np.arange(k)
+    a = np.zeros(k, dtype=int)  # 上一个保留点
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i < n - 3:  # 下一个桶的平均点，最后一个桶取终点
+            nx, ny = x[hi:edges[i + 2]].mean(), y[:, hi:edges[i + 2]].mean(axis=1)
+        else:
+            nx, ny = x[-1], y[:, -1]
+        xa, ya = x[a], y[rows, a]
+        area = np.abs((xa - nx)[:, None] * (y[:, lo:hi] - ya[:, None]) - (xa[:, None] - x[lo:hi]) * (ny - ya)[:, None])
+        a = lo + np.argmax(area, axis=1)
+        idx[:, i + 1] = a
+    return idx
+
+# 转为长表，Y 为 (设计数, 频点数)，每条曲线降采样到 points 个点；log_x 时按对数横坐标计算面积，与显示一致
+def long_frame(x, names, Y, points=None, log_x=True, x_name="Freq", color="设计", value="value"):
+    import pandas as pd
+    x = np.asarray(x, dtype=float)
+    Y = np.asarray(Y, dtype=float).reshape(len(names), len(x))
+    idx = lttb(np.log10(x) if log_x else x, Y, points or len(x))
+    return pd.DataFrame({
+        x_name: x[idx].ravel(),
+        color: np.repeat(np.asarray(names, dtype=object), idx.shape[1]),
+        value: np.take_along_axis(Y, idx, axis=1).ravel()})
+
+# 一个指标的所有曲线绘成一个图表，颜色按 names 顺序取自 COLORS
+def line_chart(df, names, y_title, x_title="频率（Hz）", log_x=True, x_name="Freq", color="设计", value="value"):
+    import altair as alt
+    return alt.Chart(df).mark_line().encode(
+        x=alt.X(f"{x_name}:Q", scale=alt.Scale(type="log" if log_x else "linear"), title=x_title),
+        y=alt.Y(f"{value}:Q", title=y_title),
+        color=alt.Color(f"{color}:N", scale=alt.Scale(domain=list(names), range=COLORS), sort=list(names)),
+        tooltip=[alt.Tooltip(f"{color}:N"), alt.Tooltip(f"{x_name}:Q", format=".4~s"), alt.Tooltip(f"{value}:Q", format=".3f")])
@@ -0,0 +1,135 @@
+'''
+by J.Y.Zhang
+轻量的运行耗时统计
+按阶段记录墙钟耗时、调用次数和数组规模，可通过上下文管理器 stage 或装饰器 timed 在 JYAcoustic 和各页面中使用。
+记录写入当前线程激活的 Recorder，没有激活时不做任何记录，开销可以忽略；本模块只依赖标准库，
+显示面板时才导入 Streamlit 和 pandas。
+
+用法：
+  rec = JYProfile.Recorder()
+  with rec.active():
+      with JYProfile.stage("参数解析", size=len(rows)):
+          ...
+  JYProfile.panel({"页面": rec})
+
+2025/11/26 初始版本
+2025/12/10 cProfile 文件名改用 mkstemp，可合并后台线程的采样，增加 discard_cprofile 清理被中断运行遗留的采样器
+'''
+
+import contextlib
+import cProfile
+import functools
+import os
+import tempfile
+import threading
+import time
+
+_local = threading.local()
+
+class Recorder:  # 一组阶段耗时记录，线程安全
+    def __init__(self):
+        self.stats = {}  # 阶段名 → [调用次数, 总耗时, 最大数组规模]
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, size=None):
+        with self._lock:
+            stat = self.stats.setdefault(name, [0, 0.0, None])
+            stat[0] += 1
+            stat[1] += seconds
+            if size is not None: stat[2] = max(stat[2] or 0, size)
+
+    # 在当前线程激活，退出时恢复之前的记录器
+    @contextlib.contextmanager
+    def active(self):
+        previous = getattr(_local, "recorder", None)
+        _local.recorder = self
+        try:
+            yield self
+        finally:
+            _local.recorder = previous
+
+    # 汇总表，每行为 (阶段, 调用次数, 总耗时 ms, 平均耗时 ms, 最大数组规模)，按总耗时降序
+    def rows(self):
+        with self._lock:
+            items = [(name, n, t * 1e3, t * 1e3 / n, size) for name, (n, t, size) in self.stats.items()]
+        return sorted(items, key=lambda row: -row[2])
+
+def current(): return getattr(_local, "recorder", None)
+
+def _size(obj):  # 数组（或数组元组）的元素数
+    if hasattr(obj, "size") and hasattr(obj, "shape"): return int(obj.size)
+    if isinstance(obj, (tuple, list)):
+        sizes = [_size(item) for item in obj]
+        sizes = [size for size in sizes if size is not None]
+        return sum(sizes) if sizes else None
+    return None
+
+# 记录一个阶段的耗时，size 为处理的数组规模（可选）
+@contextlib.contextmanager
+def stage(name, size=None):
+    recorder = current()
+    if recorder is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.record(name, time.perf_counter() - t0, size)
+
+# 记录函数每次调用的耗时，数组规模取返回值的元素数
+def timed(name=None):
+    def decorate(func):
+        label = name or func.__name__
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = current()
+            if recorder is None: return func(*args, **kwargs)
+            t0 = time.perf_counter()
+            result = func(*args, **kwargs)
+            recorder.record(label, time.perf_counter() - t0, _size(result))
+            return result
+        return wrapper
+    return decorate
+
+# 在当前线程激活记录器且不恢复，用于页面脚本整页运行期间
+def activate(recorder): _local.recorder = recorder
+
+# cProfile 采样，stop_cprofile 写出 .prof 文件，可用 snakeviz 或 pstats 查看
+# cProfile 只记录调用它的线程，本线程当前的采样器记录在线程局部变量中
+def start_cprofile():
+    discard_cprofile()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    _local.profiler = profiler
+    return profiler
+
+# 停止本线程上遗留的采样器而不写出，用于页面运行被 st.rerun 或控件操作中断、没有执行到 stop_cprofile 的情况
+def discard_cprofile():
+    profiler = getattr(_local, "profiler", None)
+    if profiler is not None: profiler.disable()
+    _local.profiler = None
+
+# 停止采样并写出，extra 为其他线程（如后台任务）的采样器，合并到同一个文件；默认文件名唯一，多个会话互不覆盖
+def stop_cprofile(profiler, path=None, extra=()):
+    import pstats
+    profiler.disable()
+    if getattr(_local, "profiler", None) is profiler: _local.profiler = None
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix=time.strftime("jy_profile_%Y%m%d_%H%M%S_"), suffix=".prof")
+        os.close(fd)
+    stats = pstats.Stats(profiler)
+    for other in extra: stats.add(other)
+    stats.dump_stats(path)
+    return path
+
+# 在 Streamlit 页面中显示可折叠的耗时面板，recorders 为 {范围: Recorder}
+def panel(recorders, title="运行耗时", expanded=False):
+    import pandas as pd
+    import streamlit as st
+    rows = [(scope,) + row for scope, recorder in recorders.items() if recorder is not None for row in recorder.rows()]
+    df = pd.DataFrame(rows, columns=["范围", "阶段", "调用次数", "总耗时 (ms)", "平均耗时 (ms)", "最大数组规模"])
+    with st.expander(f":material/timer: {title}", expanded=expanded):
+        st.dataframe(df, hide_index=True, column_config={
+            "总耗时 (ms)": st.column_config.NumberColumn(format="%.2f"),
+            "平均耗时 (ms)": st.column_config.NumberColumn(format="%.3f")})
@@ -0,0 +1,322 @@
+'''
+by J.Y.Zhang
+用于进行音频信号的分析处理
+（1）WAV 文件的内存映射读取，上传文件按内容落盘
+（2）分段计算 Welch 功率谱密度和 STFT 时频谱，支持线程池并行
+（3）功率谱密度的 dB/Hz 标定及 A 计权
+（4）滤波器链（IIR 二阶节及 FIR）的分块流式滤波，支持多通道
+（5）常用声音素材（噪声、单频音、扫频音）的生成
+
+2025/11/12 初始版本
+2025/11/14 增加流式滤波
+2025/11/24 声音素材生成函数由素材库页面移入
+2025/11/28 scipy 改为在函数内导入，模块导入不再加载 scipy.signal
+2025/12/08 A 计权增加 FIR 高频校正，落盘和滤波输出的临时文件改用 mkstemp
+'''
+
+import hashlib
+import io
+import os
+import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import JYAcoustic as ac
+
+SPOOL_DIR = os.path.join(tempfile.gettempdir(), "jy_acoustic_uploads")  # 上传文件落盘目录
+CHUNK = 1 << 20  # 文件读写块大小，1 MB
+BLOCK = 256  # 每个计算块包含的分段数
+FRAMES = 1 << 16  # 流式滤波每块的采样点数
+
+'''
+音频文件读取
+'''
+# 将上传的文件（类文件对象）按内容哈希写入临时目录，返回 (摘要, 路径)，相同内容只写一次
+def spool(file, suffix=".wav"):
+    h = hashlib.sha1()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(CHUNK), b""):
+        h.update(chunk)
+    digest = h.hexdigest()
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    path = os.path.join(SPOOL_DIR, digest + suffix)
+    if not os.path.exists(path):
+        fd, tmp = tempfile.mkstemp(dir=SPOOL_DIR, suffix=".tmp")  # 各会话（同一进程内的线程）各用一个临时文件
+        file.seek(0)
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: file.read(CHUNK), b""):
+                out.write(chunk)
+        os.replace(tmp, path)  # 原子替换，避免并发时读到半个文件
+    file.seek(0)
+    return digest, path
+
+# 以内存映射方式读取 WAV 文件，返回采样率和 (n,) 或 (n, 通道数) 的只读样本数组
+def read_wav(path):
+    import scipy.io.wavfile as wavfile
+    try:
+        return wavfile.read(path, mmap=True)
+    except ValueError:  # 24 bit 等格式不支持内存映射，只能整体读入
+        return wavfile.read(path)
+
+# 数据类型对应的数字满量程
+def full_scale(dtype):
+    dtype = np.dtype(dtype)
+    if dtype.kind in "iu": return float(2 ** (8 * dtype.itemsize - 1))
+    return 1.0
+
+# 将一段样本转换为浮点数，单位为满量程（FS）乘以标定系数 cal
+def to_float(x, cal=1.0):
+    y = np.asarray(x, dtype=np.float64)
+    if x.dtype.kind == "u": y = y - full_scale(x.dtype)  # 无符号 PCM 以中点为零
+    return y * (cal / full_scale(x.dtype))
+
+'''
+分段谱分析
+cal 为数字满量程对应的声压（Pa），给定后功率谱密度的单位为 Pa^2/Hz
+'''
+def _map(func, items, workers):
+    if workers > 1:
+        with ThreadPoolExecutor(workers) as pool:  # numpy/scipy 的 FFT 会释放 GIL
+            return list(pool.map(func, items))
+    return [func(item) for item in items]
+
+def _segments(n, nperseg, step):  # 可容纳的分段数
+    return 0 if n < nperseg else 1 + (n - nperseg) // step
+
+# 计算第 seg0 段起共 nseg 段的单边功率谱密度，返回 (nseg, 通道数, 频点数)
+def _frames(x, seg0, nseg, nperseg, step, win, scale, cal):
+    import scipy.fft
+    start = seg0 * step
+    block = to_float(x[start:start + (nseg - 1) * step + nperseg], cal)
+    block = block.reshape(len(block), -1)
+    frames = np.lib.stride_tricks.sliding_window_view(block, nperseg, axis=0)[::step]
+    frames = frames - frames.mean(axis=-1, keepdims=True)  # 去除各段直流
+    X = scipy.fft.rfft(frames * win, axis=-1)
+    P = (X.real ** 2 + X.imag ** 2) * scale
+    P[..., 1:(nperseg + 1) // 2] *= 2  # 单边谱，直流和奈奎斯特频点不翻倍
+    return P
+
+def _setup(fs, nperseg, overlap, window):
+    import scipy.signal
+    step = max(1, int(round(nperseg * (1 - overlap))))
+    win = scipy.signal.get_window(window, nperseg)
+    scale = 1 / (fs * np.sum(win ** 2))
+    return step, win, scale
+
+def _shape(P, x):  # 单通道输入时去掉通道维度，通道维放在最后
+    P = np.moveaxis(P, 0, -1)
+    return P[..., 0] if np.ndim(x) == 1 else P
+
+# Welch 功率谱密度，逐块累加，内存占用与文件长度无关，返回频率和 (频点数,) 或 (频点数, 通道数)
+def welch(x, fs, nperseg=4096, overlap=0.5, window="hann", cal=1.0, workers=1):
+    step, win, scale = _setup(fs, nperseg, overlap, window)
+    nseg = _segments(len(x), nperseg, step)
+    if nseg == 0: raise ValueError(f"信号长度 {len(x)} 小于分段长度 {nperseg}")
+    def block_sum(seg0):
+        return _frames(x, seg0, min(BLOCK, nseg - seg0), nperseg, step, win, scale, cal).sum(axis=0)
+    P = sum(_map(block_sum, range(0, nseg, BLOCK), workers)) / nseg
+    f = np.fft.rfftfreq(nperseg, d=1 / fs)
+    return f, _shape(P, x)
+
+# STFT 时频谱，相邻帧按时间平均，使输出不超过 max_frames 列，返回频率、时间和 (频点数, 帧数[, 通道数])
+def spectrogram(x, fs, nperseg=1024, overlap=0.5, window="hann", cal=1.0, max_frames=2000, workers=1):
+    step, win, scale = _setup(fs, nperseg, overlap, window)
+    nseg = _segments(len(x), nperseg, step)
+    if nseg == 0: raise ValueError(f"信号长度 {len(x)} 小于分段长度 {nperseg}")
+    avg = -(-nseg // max_frames)  # 每列平均的帧数
+    ncol = -(-nseg // avg)
+    nch = 1 if np.ndim(x) == 1 else x.shape[1]
+    cols_per_block = max(1, BLOCK // avg)
+    def block_cols(col0):
+        col1 = min(col0 + cols_per_block, ncol)
+        seg0, seg1 = col0 * avg, min(col1 * avg, nseg)
+        S = np.zeros((col1 - col0, nch, nperseg // 2 + 1))
+        for s in range(seg0, seg1, BLOCK):  # 单列帧数很多时分块累加
+            n = min(BLOCK, seg1 - s)
+            P = _frames(x, s, n, nperseg, step, win, scale, cal)
+            cols = np.arange(s, s + n) // avg - col0
+            starts = np.flatnonzero(np.diff(cols, prepend=-1))
+            S[cols[starts]] += np.add.reduceat(P, starts, axis=0)
+        counts = np.minimum(np.arange(col0 + 1, col1 + 1) * avg, nseg) - np.arange(col0, col1) * avg
+        return S / counts[:, None, None]
+    S = np.concatenate(_map(block_cols, range(0, ncol, cols_per_block), workers))  # (帧数, 通道数, 频点数)
+    first = np.arange(ncol) * avg
+    last = np.minimum(first + avg, nseg) - 1
+    t = (first * step + last * step + nperseg) / 2 / fs  # 每列覆盖时间段的中点
+    f = np.fft.rfftfreq(nperseg, d=1 / fs)
+    S = np.transpose(S, (2, 0, 1))  # (频点数, 帧数, 通道数)
+    return f, t, S[..., 0] if np.ndim(x) == 1 else S
+
+'''
+标定与计权
+'''
+# 功率谱密度转换为 dB/Hz，参考值默认 20 uPa，即声压谱级
+def PSD_dB(P, ref=20e-6):
+    with np.errstate(divide="ignore"):
+        return 10 * np.log10(P / ref ** 2)
+
+# 对 dB 谱进行 A 计权，直流频点记为 -inf
+def A_weighted(f, LdB):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        w = np.where(f > 0, ac.A_weight(np.where(f > 0, f, 1.0)), -np.inf)
+    return LdB + (w if np.ndim(LdB) == 1 else w[:, None])
+
+# 频带 [f1, f2] 内的总声压级（dB），P 为功率谱密度（Pa^2/Hz）
+def band_SPL(f, P, f1=20, f2=20000):
+    df = f[1] - f[0]
+    sel = (f >= f1) & (f <= f2)
+    return ac.SPL(np.sqrt(np.sum(P[sel], axis=0) * df))
+
+'''
+流式滤波
+IIR 滤波器以二阶节（SOS）表示，串联后分块处理，块间保留滤波器状态，结果与整体滤波一致
+'''
+# A 计权的 IIR 部分，由 IEC 61672-1 模拟原型经双线性变换得到，1 kHz 处增益归一化为 0 dB
+# 双线性变换的频率压缩使高频衰减过大（44.1 kHz 时 16 kHz 处约低 8.5 dB），需配合 A_weight_filter 中的 FIR 校正使用
+def A_weight_sos(fs):
+    import scipy.signal
+    _, f1, f2, f3, f4 = ac._A_weight_poles()  # 与 ac.A_weight 使用同一组极点频率
+    z = np.zeros(4)
+    p = -2 * ac.PI * np.array([f1, f1, f2, f3, f4, f4])
+    zd, pd, kd = scipy.signal.bilinear_zpk(z, p, 1.0, fs)
+    sos = scipy.signal.zpk2sos(zd, pd, kd)
+    _, h = scipy.signal.sosfreqz(sos, [1000], fs=fs)
+    sos[0, :3] /= np.abs(h[0])
+    return sos
+
+# A 计权滤波器，返回 (二阶节, FIR 校正核)：IIR 保证低频精度，短 FIR 按频率采样法补偿双线性变换的高频误差，
+# 校正增益上限 30 dB（奈奎斯特频率处 IIR 增益为 0）；44.1 kHz 时 20 kHz 以下与 ac.A_weight 相差不超过 0.4 dB
+def A_weight_filter(fs, numtaps=129):
+    import scipy.signal
+    sos = A_weight_sos(fs)
+    f = np.linspace(0, fs / 2, 1025)
+    _, h = scipy.signal.sosfreqz(sos, f, fs=fs)
+    g = np.ones_like(f)
+    g[1:-1] = np.minimum(10**(ac.A_weight(f[1:-1]) / 20) / np.abs(h[1:-1]), 10**1.5)
+    g[-1] = g[-2]
+    return sos, scipy.signal.firwin2(numtaps, f, g, fs=fs)
+
+# 麦克风灵敏度频响的 FIR 滤波器（线性相位），按频率采样法由集中参数模型（MIC_batch）计算，f_ref 处增益归一化为 0 dB
+def MIC_fir(fs, paras, numtaps=1025, f_ref=1000):
+    import scipy.signal
+    f = np.linspace(0, fs / 2, numtaps // 2 + 1)
+    g = np.zeros_like(f)  # 直流处灵敏度为 0
+    H, _ = ac.MIC_batch([paras], np.append(f[1:], f_ref))  # 所有频点一次求解，最后一列为参考频率
+    g[1:] = np.abs(H[0, :-1]) / np.abs(H[0, -1])
+    return scipy.signal.firwin2(numtaps, f, g, fs=fs)
+
+class FilterChain:  # 滤波器链
+    # spec 为滤波器描述的元组，例如 (("highpass", 100), ("A",), ("mic", (0.3, 0.2, ...)))，可直接作为缓存键
+    # 线性时不变滤波器可交换顺序，IIR 级合并为一组二阶节，FIR 级合并为一个卷积核
+    def __init__(self, fs, spec=()):
+        self.fs, self.spec = fs, tuple(spec)
+        stages = []
+        for item in self.spec:
+            h = self.design(*item)
+            stages += list(h) if isinstance(h, tuple) else [h]
+        sos = [h for h in stages if np.ndim(h) == 2]
+        self.sos = np.vstack(sos) if sos else np.empty((0, 6))
+        self.fir = np.array([1.0])
+        for h in stages:
+            if np.ndim(h) == 1: self.fir = np.convolve(self.fir, h)
+        self.reset()
+        
+    # 设计单级滤波器，IIR 返回二阶节系数，FIR 返回卷积核，IIR + FIR 组合返回两者的元组
+    def design(self, kind, *args):
+        import scipy.signal
+        if kind in ("highpass", "lowpass"):
+            return scipy.signal.butter(4, args[0], btype=kind, fs=self.fs, output="sos")
+        if kind == "bandpass":
+            return scipy.signal.butter(4, args[:2], btype=kind, fs=self.fs, output="sos")
+        if kind == "A": return A_weight_filter(self.fs)
+        if kind == "mic": return MIC_fir(self.fs, args[0])
+        raise ValueError(f"未知的滤波器类型：{kind}")
+    
+    def reset(self): self.zi_sos, self.zi_fir = None, None
+    
+    # 滤波一块数据，x 为 (n,) 或 (n, 通道数)，接着上一块的状态继续
+    def process(self, x):
+        import scipy.signal
+        y = x
+        if len(self.sos):
+            if self.zi_sos is None: self.zi_sos = np.zeros((len(self.sos), 2) + np.shape(x)[1:])
+            y, self.zi_sos = scipy.signal.sosfilt(self.sos, y, axis=0, zi=self.zi_sos)
+        if len(self.fir) > 1:
+            if self.zi_fir is None: self.zi_fir = np.zeros((len(self.fir) - 1,) + np.shape(x)[1:])
+            y, self.zi_fir = scipy.signal.lfilter(self.fir, [1.0], y, axis=0, zi=self.zi_fir)
+        return y
+
+# 对 WAV 文件逐块滤波并写出 16 bit PCM 文件（用于回放），输入为内存映射，内存占用与文件长度无关
+def filter_wav(src, dst, spec, cal=1.0, frames=FRAMES):
+    fs, x = read_wav(src)
+    chain = FilterChain(fs, spec)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dst)), suffix=".tmp")  # 各会话各用一个临时文件
+    with os.fdopen(fd, "wb") as f, wave.open(f, "wb") as out:
+        out.setnchannels(1 if x.ndim == 1 else x.shape[1])
+        out.setsampwidth(2)
+        out.setframerate(fs)
+        for i in range(0, len(x), frames):
+            y = chain.process(to_float(x[i:i + frames], cal))
+            out.writeframes(np.clip(np.round(y * 32767), -32768, 32767).astype("<i2").tobytes())
+    os.replace(tmp, dst)
+    return dst
+
+# 按上传文件摘要和滤波器描述确定输出文件，已存在时直接复用
+def filtered_path(digest, spec):
+    key = hashlib.sha1(repr(spec).encode()).hexdigest()[:12]
+    return os.path.join(SPOOL_DIR, f"{digest}-{key}.wav")
+
+'''
+声音素材生成
+'''
+# 生成白噪声
+def generate_white_noise(duration=5, sample_rate=44100, mean=0, std=1):
+    num_samples = int(sample_rate * duration)
+    noise = np.random.normal(mean, std, num_samples)
+    noise = noise / np.max(np.abs(noise))
+    return noise *0.5
+
+def generate_pink_noise(duration=5, sample_rate=44100):
+    import scipy.fft
+    num_samples = int(sample_rate * duration)
+    white_noise = np.random.normal(0, 1, num_samples)
+    X = scipy.fft.rfft(white_noise)
+    S = np.zeros_like(X)
+    freqs = np.fft.rfftfreq(num_samples, d=1/sample_rate)
+    S[1:] = 1 / np.sqrt(freqs[1:])
+    pink_fft = X * S
+    pink_noise = scipy.fft.irfft(pink_fft)
+    pink_noise = pink_noise / np.max(np.abs(pink_noise))
+    return pink_noise *0.5
+
+def generate_red_noise(duration=5, sample_rate=44100):
+    import scipy.fft
+    num_samples = int(sample_rate * duration)
+    white_noise = np.random.normal(0, 1, num_samples)
+    X = scipy.fft.rfft(white_noise)
+    S = np.zeros_like(X)
+    freqs = np.fft.rfftfreq(num_samples, d=1/sample_rate)
+    S[1:] = 1 /freqs[1:]
+    red_fft = X * S
+    red_noise = scipy.fft.irfft(red_fft)
+    red_noise = red_noise / np.max(np.abs(red_noise))
+    return red_noise *0.5
+
+# 单频音和扫频音
+def generate_tone(frequency=440, duration=5, sample_rate=44100):
+    t = np.linspace(0, duration, int(duration * sample_rate), endpoint=False)
+    return 0.5 * np.sin(2 * np.pi * frequency * t)
+
+def generate_sweep(start_freq=20, end_freq=20000, duration=10, sample_rate=44100):
+    t = np.linspace(0, duration, int(duration * sample_rate), endpoint=False)
+    return 0.5 * np.sin(2 * np.pi * (start_freq + (end_freq - start_freq)/duration * t) * t)
+
+# 音频转字节流函数
+def audio_to_bytes(audio_data, sample_rate):
+    import scipy.io.wavfile as wavfile
+    audio_data = np.int16(audio_data * 32767)
+    byte_io = io.BytesIO()
+    wavfile.write(byte_io, sample_rate, audio_data)
+    return byte_io.getvalue()
@@ -0,0 +1,128 @@
+'''
+by J.Y.Zhang
+参数扫描结果的内存映射存储
+结果以 (设计 × 频率 × 指标) 的 float32 数组顺序写入磁盘，配合一个小的 JSON 索引（参数名、频率网格、写入时间等），
+支持分块追加、按设计编号随机读取，以及不载入内存的惰性视图，百万级设计的扫描结果可直接留在磁盘上查询。
+
+目录结构：
+  index.json   元数据索引
+  data.f32     (n, 频点数, 指标数) float32
+  paras.f64    (n, 8) float64 设计参数
+  design.i64   (n,) int64 设计编号
+
+2025/11/20 初始版本
+'''
+
+import json
+import os
+import time
+
+import numpy as np
+
+import JYAcoustic as ac
+
+METRICS = ["sens", "noise", "phase"]  # 灵敏度（dB）、噪声（dB）、相位（rad）
+
+# 由 (n, 频点数, 指标数) 数组构造宽表，首列为频率，每个设计每个指标一列，列名为 "设计名_指标"
+def to_frame(freqs, names, data, metrics=METRICS):
+    import pandas as pd
+    data = np.asarray(data)
+    columns = {"Freq": freqs}
+    for k, metric in enumerate(metrics):
+        for i, name in enumerate(names):
+            columns[f"{name}_{metric}"] = data[i, :, k]
+    return pd.DataFrame(columns)
+
+class ResultStore:  # 结果存储
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+            self.index = json.load(f)
+        self.freqs = np.array(self.index["freqs"])
+        self.metrics = self.index["metrics"]
+        self._order = None
+
+    # 新建空的存储目录
+    @classmethod
+    def create(cls, path, freqs, metrics=METRICS, para_names=ac.PARA_NAMES, note=""):
+        os.makedirs(path, exist_ok=False)
+        index = {"freqs": np.asarray(freqs, dtype=float).tolist(), "metrics": list(metrics),
+                 "para_names": list(para_names), "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                 "note": note, "n": 0, "chunks": []}
+        for name in ("data.f32", "paras.f64", "design.i64"):
+            open(os.path.join(path, name), "wb").close()
+        cls._write_index(path, index)
+        return cls(path)
+
+    @staticmethod
+    def _write_index(path, index):
+        tmp = os.path.join(path, f"index.json.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(path, "index.json"))  # 先写数据后更新索引，读者只会看到完整的块
+
+    def __len__(self): return self.index["n"]
+
+    # 重新读取索引，看到其他进程追加的数据
+    def refresh(self):
+        with open(os.path.join(self.path, "index.json"), encoding="utf-8") as f:
+            self.index = json.load(f)
+        self._order = None
+
+    # 追加一块结果，data 为 (n, 频点数, 指标数) 数组或 {指标: (n, 频点数)} 字典
+    def append(self, design, paras, data):
+        if isinstance(data, dict):
+            data = np.stack([data[m] for m in self.metrics], axis=-1)
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        n = len(design)
+        if data.shape != (n, len(self.freqs), len(self.metrics)):
+            raise ValueError(f"数据形状 {data.shape} 与存储不符")
+        if n == 0: return
+        # 从索引记录的行数处写入，先截断之前中断的追加留下的多余字节，避免之后的块整体错位
+        for name, arr in (("data.f32", data), ("paras.f64", np.asarray(paras, dtype=np.float64)),
+                          ("design.i64", np.asarray(design, dtype=np.int64))):
+            offset = self.index["n"] * (arr.nbytes // n)
+            with open(os.path.join(self.path, name), "r+b") as f:
+                f.truncate(offset)
+                f.seek(offset)
+                f.write(arr.tobytes())
+        self.index["chunks"].append({"start": self.index["n"], "count": n, "time": time.strftime("%Y-%m-%d %H:%M:%S")})
+        self.index["n"] += n
+        self._write_index(self.path, self.index)
+        self._order = None
+
+    # 惰性视图，只映射不读取
+    def _map(self, name, dtype, shape):
+        if self.index["n"] == 0: return np.empty(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape)
+    @property
+    def data(self): return self._map("data.f32", np.float32, (len(self), len(self.freqs), len(self.metrics)))
+    @property
+    def paras(self): return self._map("paras.f64", np.float64, (len(self), len(self.index["para_names"])))
+    @property
+    def design(self): return self._map("design.i64", np.int64, (len(self),))
+
+    # 某一指标的 (n, 频点数) 视图
+    def metric(self, name): return self.data[:, :, self.metrics.index(name)]
+
+    # 设计编号对应的行号，编号不存在时报错
+    def rows(self, ids):
+        ids = np.atleast_1d(ids)
+        if len(self) == 0:  # 空存储没有可映射的数据
+            if len(ids): raise KeyError(f"设计编号不存在：{ids.tolist()}")
+            return np.zeros(0, np.int64)
+        if self._order is None: self._order = np.argsort(self.design, kind="stable")
+        design = self.design
+        pos = np.searchsorted(design, ids, sorter=self._order)
+        rows = self._order[np.minimum(pos, len(design) - 1)]
+        missing = design[rows] != ids
+        if missing.any(): raise KeyError(f"设计编号不存在：{ids[missing].tolist()}")
+        return rows
+
+    # 按设计编号随机读取，返回 (len(ids), 频点数, 指标数) 数组
+    def get(self, ids): return np.asarray(self.data[self.rows(ids)])
+
+    # 按设计编号读取并构造宽表，用于界面显示
+    def frame(self, ids, names=None):
+        names = names or [str(i) for i in np.atleast_1d(ids)]
+        return to_frame(self.freqs, names, self.get(ids), self.metrics)
@@ -1,39 +1,26 @@
 import streamlit as st
-import numpy as np
-import scipy.signal as signal
-import scipy.io.wavfile as wavfile
-import io
-import matplotlib.pyplot as plt
+import os
+import JYSignal as js
 
 # 设置页面配置
 st.set_page_config(page_title="音频滤波器", layout="centered")
 
-# 缓存音频数据
-@st.cache_data
-def load_audio(file):
-    # 使用 scipy 读取 WAV 文件
-    sample_rate, samples = wavfile.read(file)
-    
-    # 处理多通道音频（仅保留单通道）
-    if len(samples.shape) > 1:
-        samples = samples[:, 0]  # 取第一个通道
-    
-    # 确保数据类型为 int16（16 位 PCM）
-    samples = samples.astype(np.int16)
-    
-    return sample_rate, samples
-
-# 缓存滤波器处理结果
+# 滤波结果文件以上传文件的内容摘要和滤波器描述命名，文件存在即复用，被清理后重新生成
+def apply_filter(digest, path, spec):
+    out = js.filtered_path(digest, spec)
+    if not os.path.exists(out):
+        js.filter_wav(path, out, spec)
+    return out
+
+# 缓存频谱分析结果，以文件路径（含内容摘要）为键，分段读取内存映射数据
 @st.cache_data
-def apply_filter(sample_rate, samples, cutoff):
-    # 设计高通滤波器
-    nyquist = 0.5 * sample_rate
-    normal_cutoff = cutoff / nyquist
-    b, a = signal.butter(4, normal_cutoff, btype='high', analog=False)
-    
-    # 应用滤波器
-    filtered = signal.lfilter(b, a, samples)
-    return filtered.astype(samples.dtype)
+def spectrum(path, channel, nperseg, cal):
+    sample_rate, samples = js.read_wav(path)
+    if samples.ndim > 1:
+        samples = samples[:, channel]
+    f, P = js.welch(samples, sample_rate, nperseg=nperseg, cal=cal, workers=4)
+    _, t, S = js.spectrogram(samples, sample_rate, nperseg=min(nperseg, 2048), cal=cal, max_frames=1000, workers=4)
+    return f, P, t, S
 
 # 主程序
 st.title("🎵 音频滤波处理工具")
@@ -42,14 +29,22 @@ st.title("🎵 音频滤波处理工具")
 uploaded_file = st.file_uploader("请选择WAV音频文件", type=["wav"])
 
 if uploaded_file:
-    # 加载音频
-    sample_rate, samples = load_audio(uploaded_file)
-    
+    # 加载音频（内存映射，不整体读入）
+    # 每个上传文件只落盘和求摘要一次，之后的重跑（如调整侧边栏）直接复用
+    spooled = st.session_state.get("spooled")
+    if spooled is None or spooled[0] != uploaded_file.file_id or not os.path.exists(spooled[2]):
+        spooled = (uploaded_file.file_id,) + js.spool(uploaded_file)
+        st.session_state["spooled"] = spooled
+    _, digest, path = spooled
+    sample_rate, samples = js.read_wav(path)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+
     # 显示音频信息
     st.sidebar.markdown("### 📁 音频信息")
     st.sidebar.write(f"采样率: {sample_rate} Hz")
+    st.sidebar.write(f"通道数: {channels}")
     st.sidebar.write(f"时长: {len(samples)/sample_rate:.2f} 秒")
-    
+
     # 滤波器选择
     filter_options = {
         "无滤波": 0,
@@ -57,54 +52,80 @@ if uploaded_file:
         "200Hz高通": 200,
         "500Hz高通": 500
     }
-    
+
     selected_filter = st.sidebar.radio(
         "⚙️ 选择滤波器",
         list(filter_options.keys()),
         index=0
     )
-    
-    # 获取滤波器参数
+    lowpass = st.sidebar.number_input("低通截止频率 (Hz)，0 为不滤波", 0, sample_rate // 2 - 1, 0)
+    a_weight = st.sidebar.checkbox("A 计权", False)
+    mic_para = st.sidebar.text_input("麦克风频响（8 个设计参数，留空为不仿真）", "",
+                                     help="依次为声孔直径、声孔长度、前腔体积、后腔体积、振膜声顺、泄气孔声阻尼、薄流层声阻尼、薄流层声质量，用英文逗号连接")
+
+    # 组合滤波器链，各级在一次分块遍历中完成
     cutoff = filter_options[selected_filter]
-    
-    # 预计算滤波结果（缓存）
+    spec = []
     if cutoff > 0:
-        filtered_samples = apply_filter(sample_rate, samples, cutoff)
-    else:
-        filtered_samples = samples
-    
+        spec.append(("highpass", cutoff))
+    if lowpass > 0:
+        spec.append(("lowpass", lowpass))
+    if a_weight:
+        spec.append(("A",))
+    if mic_para.strip():
+        try:
+            mic = tuple(float(item) for item in mic_para.split(','))
+            if len(mic) != 8:
+                raise ValueError
+            spec.append(("mic", mic))
+        except ValueError:
+            st.sidebar.warning("麦克风参数无效，已忽略")
+    spec = tuple(spec)
+
+    # 预计算滤波结果（缓存）
+    filtered_path = apply_filter(digest, path, spec) if spec else path
+
     # 播放音频
     st.markdown("### 🎧 音频播放")
-    # 将 numpy 数组转换为字节流
-    audio_data = filtered_samples.tobytes()
-    st.audio(audio_data, format='audio/wav', sample_rate=sample_rate)
-    
+    st.audio(filtered_path, format='audio/wav')
+
     # 显示原始和处理后音频对比
     st.markdown("### 📊 音频对比")
     col1, col2 = st.columns(2)
-    
+
     with col1:
         st.subheader("原始音频")
-        st.audio(samples.tobytes(), format='audio/wav', sample_rate=sample_rate)
-    
+        st.audio(path, format='audio/wav')
+
     with col2:
         st.subheader("处理后音频")
-        st.audio(audio_data, format='audio/wav', sample_rate=sample_rate)
-    
+        st.audio(filtered_path, format='audio/wav')
+
     # 频谱分析（可选）
     if st.checkbox("📊 显示频谱分析"):
         st.markdown("### 📈 频谱图")
-        import matplotlib.pyplot as plt
-        from scipy.fft import fft
-        
-        n = len(samples)
-        yf = fft(samples)
-        xf = np.linspace(0, sample_rate, n)
-        
+        import matplotlib.pyplot as plt  # 只在显示频谱时导入
+        nperseg = st.sidebar.select_slider("分段长度", [512, 1024, 2048, 4096, 8192, 16384], value=4096)
+        cal = st.sidebar.number_input("满量程声压 (Pa)", value=1.0, help="数字满量程对应的声压，用于将功率谱标定为声压谱级")
+        channel = st.sidebar.number_input("分析通道", 0, channels - 1, 0)
+        a_weight_psd = st.sidebar.checkbox("频谱 A 计权", False)
+        f, P, t, S = spectrum(filtered_path, channel, nperseg, cal)
+        L = js.PSD_dB(P)
+        if a_weight_psd:
+            L = js.A_weighted(f, L)
+
         fig, ax = plt.subplots()
-        ax.plot(xf[:n//2], 20 * np.log10(np.abs(yf[:n//2])))
+        ax.semilogx(f[1:], L[1:])
         ax.set_xlabel('频率 (Hz)')
-        ax.set_ylabel('幅度 (dB)')
+        ax.set_ylabel('声压谱级 (dB/Hz)')
+        ax.set_title(f"总声压级 {js.band_SPL(f, P):.1f} dB")
+        st.pyplot(fig)
+
+        fig, ax = plt.subplots()
+        ax.pcolormesh(t, f[1:], js.PSD_dB(S[1:]), shading='auto')
+        ax.set_yscale('log')
+        ax.set_xlabel('时间 (s)')
+        ax.set_ylabel('频率 (Hz)')
         st.pyplot(fig)
 
 else:
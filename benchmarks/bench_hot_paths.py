@@ -0,0 +1,166 @@
+'''
+by J.Y.Zhang
+JYAcoustic / JYSignal 热点函数的性能基准与数值回归
+每个用例记录最短耗时和峰值内存（tracemalloc），并与基线比较，超过阈值即判为退化；
+同时将输出的摘要（均值、标准差和若干等间隔采样值）与金标准比较，防止提速改变计算结果。
+
+  golden.json    金标准输出摘要，与机器无关，随代码提交
+  baseline.json  耗时和内存基线，与机器有关，首次运行或 --update 时生成
+
+用法：
+  python benchmarks/bench_hot_paths.py                 运行全部用例并与基线、金标准比较
+  python benchmarks/bench_hot_paths.py --only mic      只运行名称包含 mic 的用例
+  python benchmarks/bench_hot_paths.py --update        以本次结果更新基线（金标准只在缺失或加 --update-golden 时写入，写入时会提示）
+
+2025/11/24 初始版本
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import JYAcoustic as ac
+import JYSignal as js
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GOLDEN = os.path.join(HERE, "golden.json")
+BASELINE = os.path.join(HERE, "baseline.json")
+FREQS = np.logspace(1, 5, 1000)
+DESIGN = [0.3, 0.2, 0.15, 1.3, 1.85, 180, 280, 6.0]
+
+'''
+用例：每个用例为无参函数，返回用于数值比较的数组
+'''
+def designs(n):  # 在默认设计附近均匀扰动的 n 个设计，固定随机种子
+    return np.array(DESIGN) * np.random.default_rng(0).uniform(0.8, 1.2, (n, 8))
+
+def mic_class_1():  # 页面原有的逐频点对象求解
+    return np.array([ac.MIC_from_paras(DESIGN, f).Sens(f) for f in FREQS])
+
+def mic_batch(n, chunk=1000):
+    def run():
+        P = designs(n)
+        out = []
+        for i in range(0, n, chunk):
+            H, N = ac.MIC_batch(P[i:i + chunk], FREQS)
+            out.append(np.stack([ac.dB(np.abs(H)), ac.dB(N)], axis=-1)[:, ::100])
+        return np.concatenate(out)
+    return run
+
+def mic_jacobian_100():  # 100 个设计对 8 个参数的雅可比矩阵
+    return np.stack(ac.MIC_jacobian(designs(100), FREQS))[:, :, :, ::100]
+
+def thd_1M():  # 1M 个采样点的失真计算
+    t = np.arange(1_000_000) / 1e6
+    return np.array([ac.THD(np.sin(2 * ac.PI * t) + 0.01 * np.sin(6 * ac.PI * t))])
+
+def interp_1M():  # 1M 个乱序时间戳重采样到一个周期后计算失真
+    rng = np.random.default_rng(1)
+    x = rng.uniform(0, 50, 1_000_000)
+    y = np.sin(2 * ac.PI * x) + 0.02 * np.sin(4 * ac.PI * x)
+    y1 = ac.interp(x, y, 1.0)
+    return np.append(y1, ac.THD(y1))
+
+def noise(func):  # 10 分钟噪声生成，固定随机种子
+    def run():
+        np.random.seed(0)
+        return func(duration=600)
+    return run
+
+def weight_100k():  # 10 万频点的 A 计权
+    return ac.A_weight(np.linspace(10, 20000, 100_000))
+
+CASES = {
+    "mic_class_1": mic_class_1,
+    "mic_batch_1": mic_batch(1),
+    "mic_batch_100": mic_batch(100),
+    "mic_batch_10k": mic_batch(10_000),
+    "mic_jacobian_100": mic_jacobian_100,
+    "thd_1M": thd_1M,
+    "interp_1M": interp_1M,
+    "white_noise_10min": noise(js.generate_white_noise),
+    "pink_noise_10min": noise(js.generate_pink_noise),
+    "red_noise_10min": noise(js.generate_red_noise),
+    "A_weight_100k": weight_100k,
+}
+
+'''
+测量与比较
+'''
+def summary(y, samples=16):  # 输出摘要：形状、均值、标准差和等间隔采样值
+    y = np.ravel(np.asarray(y, dtype=float))
+    idx = np.linspace(0, len(y) - 1, min(samples, len(y))).astype(int)
+    return {"size": len(y), "mean": float(np.mean(y)), "std": float(np.std(y)), "samples": y[idx].tolist()}
+
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        y = func()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()  # 单独测一次内存，避免 tracemalloc 的开销计入耗时
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"time": min(times), "peak_MB": peak / 2**20}, summary(y)
+
+def same(a, b, rtol):
+    if a["size"] != b["size"]: return False
+    x = np.array([a["mean"], a["std"]] + a["samples"])
+    y = np.array([b["mean"], b["std"]] + b["samples"])
+    return bool(np.allclose(x, y, rtol=rtol, atol=1e-12, equal_nan=True))
+
+def load(path):
+    if not os.path.exists(path): return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, ensure_ascii=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="热点函数性能基准与数值回归")
+    parser.add_argument("--only", default="", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例重复次数，取最短耗时")
+    parser.add_argument("--threshold", type=float, default=1.25, help="耗时或内存超过基线的倍数即判为退化")
+    parser.add_argument("--rtol", type=float, default=1e-7, help="数值比较的相对容差")
+    parser.add_argument("--update", action="store_true", help="以本次结果更新基线")
+    parser.add_argument("--update-golden", action="store_true", help="以本次输出更新金标准")
+    args = parser.parse_args(argv)
+
+    golden, baseline = load(GOLDEN), load(BASELINE)
+    failures, added = [], []
+    print(f"{'用例':<20}{'耗时 (s)':>12}{'基线':>10}{'内存 (MB)':>12}{'基线':>10}  结果")
+    for name, func in CASES.items():
+        if args.only not in name: continue
+        stats, out = measure(func, args.repeat)
+        base = baseline.get(name)
+        status = []
+        if base and stats["time"] > base["time"] * args.threshold: status.append("耗时退化")
+        if base and stats["peak_MB"] > base["peak_MB"] * args.threshold + 1: status.append("内存退化")
+        if name in golden and not args.update_golden and not same(out, golden[name], args.rtol): status.append("结果改变")
+        if name not in golden or args.update_golden:
+            golden[name] = out
+            added.append(name)
+        if not base or args.update: baseline[name] = stats
+        failures += [f"{name}: {s}" for s in status]
+        print(f"{name:<20}{stats['time']:>12.4f}{(base or stats)['time']:>10.4f}"
+              f"{stats['peak_MB']:>12.1f}{(base or stats)['peak_MB']:>10.1f}  {'，'.join(status) or 'OK'}")
+    if added:  # 金标准只在缺失或显式要求时写入
+        save(GOLDEN, golden)
+        print(f"\n金标准已{'更新' if args.update_golden else '补充'}：{'，'.join(added)}")
+    save(BASELINE, baseline)
+    if failures:
+        print("\n".join(["", "退化："] + failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+'''
+by J.Y.Zhang
+模块和页面的导入耗时预算
+每个目标在全新的解释器中导入（页面只执行其顶层 import 语句，不运行页面），取多次运行的最短耗时，
+超过预算即返回非零，用于防止重型依赖被重新加到启动路径上。预算按开发机测得的耗时留出余量，
+在较慢的机器上可用 --scale 整体放宽。
+
+用法：python benchmarks/import_budget.py [--repeat 5] [--scale 1.5]
+
+2025/11/28 初始版本
+'''
+
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 目标 → 预算（ms），.py 结尾的为页面脚本
+BUDGETS = {
+    "JYProfile": 20,
+    "JYJobs": 40,
+    "JYAcoustic": 200,
+    "JYSignal": 250,
+    "JYStore": 250,
+    "JYDesign": 200,
+    "JYCache": 200,
+    "mic_batch": 300,
+    "streamlit_app.py": 900,
+    "page_sound_library.py": 1000,
+    "page_weighting.py": 1800,
+    "page_frequency_response_simulation.py": 2000,
+    "animation_demo.py": 1000,
+}
+
+# 页面脚本的顶层 import 语句
+def page_imports(path):
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    return "\n".join(ast.get_source_segment(source, node)
+                     for node in ast.parse(source).body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+def measure(target, repeat):
+    code = page_imports(os.path.join(ROOT, target)) if target.endswith(".py") else f"import {target}"
+    script = f"import time\nt0 = time.perf_counter()\n{code}\nprint(time.perf_counter() - t0)"
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]) * 1e3)
+    return min(times)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导入耗时预算检查")
+    parser.add_argument("--repeat", type=int, default=5, help="每个目标的运行次数，取最短耗时")
+    parser.add_argument("--scale", type=float, default=1.0, help="预算整体放宽的倍数")
+    args = parser.parse_args(argv)
+    failures = []
+    print(f"{'目标':<40}{'耗时 (ms)':>12}{'预算 (ms)':>12}")
+    for target, budget in BUDGETS.items():
+        ms = measure(target, args.repeat)
+        over = ms > budget * args.scale
+        if over: failures.append(target)
+        print(f"{target:<40}{ms:>12.1f}{budget * args.scale:>12.0f}  {'超出预算' if over else 'OK'}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+'''
+by J.Y.Zhang
+麦克风集中参数仿真的命令行批处理工具，不依赖 Streamlit，可用于夜间流水线
+输入为与仿真页相同的 8 列 CSV（声孔直径、声孔长度、前腔体积、后腔体积、振膜声顺、泄气孔声阻尼、薄流层声阻尼、薄流层声质量），
+无效行和超出单位范围的行（见 JYDesign.FIELDS）会被跳过，设计编号为输入文件的行号（从 0 开始）。设计按块分发到进程池计算，结果逐块写出，内存占用与设计数无关。
+
+输出格式由文件后缀决定：
+  .npz      design (n,)、paras (n, 8)、freqs (频点数,)、sens / noise / phase (n, 频点数)，频率网格只保存一次
+  .parquet  每个设计一行，sens / noise / phase 为定长列表列，频率网格保存在文件元数据中（需要 pyarrow）
+  .store    JYStore 内存映射结果存储目录，可分块追加、按设计编号随机读取
+
+用法：python mic_batch.py designs.csv -o result.npz --workers 8
+
+2025/11/18 初始版本
+'''
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import JYAcoustic as ac
+import JYDesign
+from JYStore import METRICS, ResultStore
+
+SUB = 250  # 进程内每次求解的设计数，MIC_batch 的复数中间数组约 200 KB/设计（1000 频点），限制单进程峰值内存
+
+# 计算一块设计，返回 {指标: (n, 频点数) float32}，灵敏度和噪声为 dB，相位为 rad
+def simulate(paras, freqs, sub=SUB):
+    out = {name: np.empty((len(paras), len(freqs)), np.float32) for name in METRICS}
+    for i in range(0, len(paras), sub):
+        H, N = ac.MIC_batch(paras[i:i + sub], freqs)
+        out["sens"][i:i + sub] = ac.dB(np.abs(H))
+        out["noise"][i:i + sub] = ac.dB(N)
+        out["phase"][i:i + sub] = np.angle(H)
+    return out
+
+class NPZWriter:  # 逐块写入 .npz，各数组先追加到临时文件，结束时流式打包
+    def __init__(self, path, freqs):
+        self.path, self.freqs, self.n = path, freqs, 0
+        self.tmp = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+        self.files = {name: open(os.path.join(self.tmp, name), "wb") for name in ["design", "paras"] + METRICS}
+
+    def write(self, design, paras, result):
+        self.files["design"].write(design.tobytes())
+        self.files["paras"].write(paras.tobytes())
+        for name in METRICS:
+            self.files[name].write(result[name].tobytes())
+        self.n += len(design)
+
+    def close(self):
+        shapes = {"design": ((self.n,), np.int64), "paras": ((self.n, 8), np.float64)}
+        shapes.update({name: ((self.n, len(self.freqs)), np.float32) for name in METRICS})
+        with zipfile.ZipFile(self.path, "w", allowZip64=True) as z:
+            with z.open("freqs.npy", "w") as out:
+                np.lib.format.write_array(out, self.freqs)
+            for name, (shape, dtype) in shapes.items():
+                self.files[name].close()
+                src = os.path.join(self.tmp, name)
+                with z.open(name + ".npy", "w", force_zip64=True) as out, open(src, "rb") as data:
+                    header = {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": shape}
+                    np.lib.format.write_array_header_1_0(out, header)
+                    for chunk in iter(lambda: data.read(1 << 20), b""):
+                        out.write(chunk)
+                os.remove(src)
+        os.rmdir(self.tmp)
+
+    # 运行出错时关闭并删除临时文件，不写出结果
+    def abort(self):
+        for f in self.files.values(): f.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+class ParquetWriter:  # 逐块写入 .parquet，每块一个行组
+    def __init__(self, path, freqs):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("写出 Parquet 需要安装 pyarrow，或改用 .npz 输出")
+        self.pa, self.nf = pa, len(freqs)
+        fields = [pa.field("design", pa.int64())] + [pa.field(name, pa.float64()) for name in ac.PARA_NAMES]
+        fields += [pa.field(name, pa.list_(pa.float32(), self.nf)) for name in METRICS]
+        schema = pa.schema(fields, metadata={"freqs": json.dumps(freqs.tolist())})
+        self.writer = pq.ParquetWriter(path, schema)
+
+    def write(self, design, paras, result):
+        pa = self.pa
+        columns = [pa.array(design)] + [pa.array(paras[:, i]) for i in range(8)]
+        columns += [pa.FixedSizeListArray.from_arrays(pa.array(result[name].ravel()), self.nf) for name in METRICS]
+        self.writer.write_table(pa.Table.from_arrays(columns, schema=self.writer.schema))
+
+    def close(self): self.writer.close()
+    def abort(self): self.writer.close()  # 已写出的行组保留，文件仍可读取
+
+class StoreWriter:  # 逐块追加到 JYStore 结果存储
+    def __init__(self, path, freqs): self.store = ResultStore.create(path, freqs, METRICS)
+    def write(self, design, paras, result): self.store.append(design, paras, result)
+    def close(self): pass
+    def abort(self): pass  # 已追加的块完整可用
+
+WRITERS = {".npz": NPZWriter, ".parquet": ParquetWriter, ".store": StoreWriter}
+
+# 按块提交到进程池，同时在途的块数有限，结果按输入顺序写出
+def run(src, dst, freqs, chunk=500, workers=None):
+    writer = WRITERS[os.path.splitext(dst.rstrip("/"))[1]](dst, freqs)
+    workers = workers or os.cpu_count()
+    pending, total = [], 0
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            for design, paras in JYDesign.read_csv(src, chunk):
+                pending.append((design, paras, pool.submit(simulate, paras, freqs)))
+                if len(pending) >= 2 * workers:
+                    design, paras, future = pending.pop(0)
+                    writer.write(design, paras, future.result())
+                    total += len(design)
+            for design, paras, future in pending:
+                writer.write(design, paras, future.result())
+                total += len(design)
+    except BaseException:  # 包括 Ctrl+C
+        writer.abort()
+        raise
+    writer.close()
+    return total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="麦克风集中参数批量仿真")
+    parser.add_argument("designs", help="设计参数 CSV，每行 8 列，无表头")
+    parser.add_argument("-o", "--output", required=True, help="输出文件，.npz、.parquet 或 .store")
+    parser.add_argument("--fmin", type=float, default=10, help="最低频率（Hz）")
+    parser.add_argument("--fmax", type=float, default=1e5, help="最高频率（Hz）")
+    parser.add_argument("--points", type=int, default=1000, help="对数频率点数")
+    parser.add_argument("--chunk", type=int, default=500, help="每块设计数，也是在途结果的大小")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认为 CPU 核数")
+    args = parser.parse_args(argv)
+    if os.path.splitext(args.output.rstrip("/"))[1] not in WRITERS:
+        parser.error("输出文件后缀必须为 .npz、.parquet 或 .store")
+    freqs = np.logspace(np.log10(args.fmin), np.log10(args.fmax), args.points)
+    total = run(args.designs, args.output, freqs, args.chunk, args.workers)
+    print(f"完成 {total} 个设计，结果写入 {args.output}")
+
+if __name__ == "__main__":
+    main()
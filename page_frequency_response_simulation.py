@@ -4,9 +4,22 @@ import pandas as pd
 import streamlit as st
 import altair as alt
 import JYAcoustic as ac
+import JYCache
+import JYDesign
+import JYJobs
+import JYPlot
+import JYProfile
+import JYStore
 st.header("MEMS 麦克风频响特性仿真", divider=True)
 
 st.caption("基于Kirchhoff Law和微孔管理论的麦克风集中参数仿真工具。输入声孔尺寸（直径、深度）、前后腔容积、振膜顺性、泄气通道声阻尼、薄流层声阻和声质量，求解Kirchhoff方程组计算麦克风的灵敏度频响、噪声谱、以及相位频响。")
+# 本次运行的耗时记录，可选同时记录 cProfile
+rec = JYProfile.Recorder()
+JYProfile.activate(rec)
+profiling = st.sidebar.toggle("记录 cProfile", False, help="记录本次运行的 cProfile 数据，运行结束后可下载")
+JYProfile.discard_cprofile()  # 上次运行被中断时遗留的采样器
+profiler = JYProfile.start_cprofile() if profiling else None
+points = st.sidebar.slider("每条曲线最多点数", 50, 1000, 300, step=50, help="曲线按 LTTB 降采样后显示，数据汇总表仍为全部频点")
 parabox = st.empty()
 curvebox = st.empty()
 log_key = "debug_log"
@@ -31,93 +44,134 @@ with parabox.container():
     +"0.35,0.2,0.15,1.3,1.85,180,280,6.0\n",
     label_visibility = "visible",
     help = "依次输入声孔直径$(mm)$，声孔长度$(mm)$，前腔体积$(mm^3)$，后腔体积$(mm^3)$，振膜声顺$(fF)$，泄气孔声阻尼$(G\Omega)$，薄流层声阻尼$(M\Omega)$，薄流层声质量$(KH)$，数据之间用英文逗号连接。无效数据不会被读取。")
-    rows = input_para.split('\n')
-    paras = [row.split(',') for row in rows]
-    paras = [[float(item) if isinstance(item, str) and item.replace('.', '', 1).isdigit() else None for item in row] for row in paras]
-    paras = [row for row in paras if all(cell is not None for cell in row) and len(row)==8]
-    names = [str(i+1)+"#" for i in range(len(paras))]
-    df = pd.DataFrame(paras, columns=
-                      ["声孔直径", "声孔长度", "前腔体积", "后腔体积", 
-                       "振膜声顺", "泄气孔声阻尼", "薄流层声阻尼", "薄流层声质量"],
-                     index = names)
+    with JYProfile.stage("参数解析", size=len(input_para)):
+        paras, _, errors = JYDesign.parse(input_para)  # 直接使用解析得到的 float64 参数，与输入一致
+        paras = paras.tolist()
+        names = [str(i+1)+"#" for i in range(len(paras))]
+        df = pd.DataFrame(paras, columns=
+                          ["声孔直径", "声孔长度", "前腔体积", "后腔体积", 
+                           "振膜声顺", "泄气孔声阻尼", "薄流层声阻尼", "薄流层声质量"],
+                         index = names)
     # st.caption("依次输入声孔直径$(mm)$，声孔长度$(mm)$，前腔体积$(mm^3)$，后腔体积$(mm^3)$，振膜声顺$(fF)$，泄气孔声阻尼$(G\Omega)$，薄流层声阻尼$(M\Omega)$，薄流层声质量$(KH)$，数据之间用英文逗号连接。无效数据不会被读取。")
     st.button("计算", type="primary")
     # st.markdown("麦克风的参数列表") 
     # st.dataframe(df) 
-    log_debug(df.to_string(header=False))
-    log_debug(f"计算中...")
+    log_debug(f"有效参数 {len(paras)} 组")
+    for line, reason in errors.items():
+        log_debug(f"第 {line+1} 行无效：{reason}")
     st.divider()
 
-with curvebox.container():
-    freqs = np.logspace(1, 5, 1000)  # 从 0.1Hz 到 100Hz
-    Sensitivity = pd.DataFrame({'Freq': freqs, })
-    Noise = pd.DataFrame({'Freq': freqs, })
-    Phase = pd.DataFrame({'Freq': freqs, })
+freqs = np.logspace(1, 5, 1000)  # 从 10Hz 到 100kHz
+
+# 所有会话共享的后台线程池
+@st.cache_resource
+def job_pool():
+    return JYJobs.executor()
+
+# 计算单个麦克风的频响，返回 (频点数, 指标数) 数组，在后台线程中执行
+def solve(para):
+    with JYProfile.stage("仿真", size=len(freqs)):
+        H, N = ac.MIC_batch([para], freqs)
+        return np.stack([ac.dB(np.abs(H[0])), ac.dB(N[0]), np.angle(H[0])], axis=-1)
+
+# solve 输出的数组布局，修改 solve 时须同时修改此标记，使旧的缓存条目失效
+SIM_SCHEMA = ("灵敏度 dB", "噪声谱 dB", "相位 rad", 1)
 
-    MICS = []    # 建立麦克风组
-    for mic_para in paras:
-        MICS.append(ac.MIC())
-    # 计算麦克风频响
-    for i, mic in enumerate(MICS):
-        mic.FC.C = ac.Ca(paras[i][2])*1e-9
-        mic.BC.C = ac.Ca(paras[i][3])*1e-9
-        mic.SD.C = paras[i][4]*1e-15
-        mic.VH.R = paras[i][5]*1e9
-        mic.BH.R = paras[i][6]*1e6
-        mic.BH.M = paras[i][7]*1e3
-        sens, noise, phase = [], [], []  # 初始化数组
-        for f in freqs:
-            mic.AH.R = ac.Ra(f=f, D=paras[i][0]*1e-3, L=paras[i][1]*1e-3)
-            mic.AH.M = ac.Ma(f=f, D=paras[i][0]*1e-3, L=paras[i][1]*1e-3)
-            sens.append(ac.dB(mic.Sens(f)))
-            noise.append(ac.dB(mic.N_total(f)))
-            phase.append(mic.phase(f))
-        Sensitivity[names[i]] = sens
-        Noise[names[i]] = noise
-        Phase[names[i]] = phase
-    log_debug(Sensitivity)
-    log_debug(Noise)
-    log_debug(Phase)
+# 先查磁盘缓存，键包含参数、频点、空气条件、JYAcoustic 的代码版本和本页的结果布局，所有会话共享
+def simulate(para):
+    key = JYCache.key(list(para), freqs, ac.T0, ac.p0, JYCache.code_version(ac), SIM_SCHEMA)
+    return JYCache.default().fetch("mic", key, solve, para)
 
-    # 绘制频响曲线
-    charts_sens, charts_noise, charts_phase = [], [], []
-    colors = ["#3b6291", "#943c39", "#779043", "#624c7c", "#388498", "#bf7334", "#3f689", "#9c403d", "#7d9847", "#675083", "#3b8ba1", "#c97937"]
-    # colors = ["red", "orange", "yellow", "green"]
-    for i, col in enumerate(names):
-        chart1 = alt.Chart(Sensitivity).mark_line().encode(
-            x=alt.X("Freq:Q", scale=alt.Scale(type='log'), title='频率（Hz）'),
-            y=alt.Y(f"{col}:Q", title="灵敏度（dB）"),
-            color=alt.value(colors[i])
-        )
-        chart2 = alt.Chart(Noise).mark_line().encode(
-            x=alt.X("Freq:Q", scale=alt.Scale(type='log'), title='频率（Hz）'),
-            y=alt.Y(f"{col}:Q", title="噪声谱（dB）"),
-            color=alt.value(colors[i])
-        )
-        chart3 = alt.Chart(Phase).mark_line().encode(
-            x=alt.X("Freq:Q", scale=alt.Scale(type='log'), title='频率（Hz）'),
-            y=alt.Y(f"{col}:Q", title="相位（rad）"),
-            color=alt.value(colors[i])
-        )
-        charts_sens.append(chart1)
-        charts_noise.append(chart2)
-        charts_phase.append(chart3)
+# 输入变化时取消旧任务并提交新任务，输入不变时沿用正在进行或已完成的任务
+job_key = tuple(map(tuple, paras))
+job = st.session_state.get("sim_job")
+if job is None or job.key != job_key:
+    if job is not None:
+        job.cancel()
+    job = JYJobs.Job(job_pool(), job_key, simulate, paras, profile=profiling)
+    st.session_state["sim_job"] = job
+
+# 计算完成前定时刷新本片段，逐步绘制已完成的曲线；polling 在整页运行时确定，片段发现完成后整页重跑一次以停止刷新
+polling = not job.done()
+@st.fragment(run_every=0.3 if polling else None)
+def show_results():
+    frag_rec = JYProfile.Recorder()  # 本片段每次运行单独记录
+    JYProfile.activate(frag_rec)
+    complete = job.done()  # 先判断是否完成再取结果，保证完成时结果齐全
+    finished = job.results()
+    if not complete:
+        st.progress(len(finished) / job.total, text=f"计算中... 已完成 {len(finished)}/{job.total}，剩余 {job.total - len(finished)}")
+    elif polling:
+        JYProfile.discard_cprofile()
+        st.rerun()  # 全部完成后整页重跑一次，停止定时刷新
+    done_names = [names[i] for i, _ in finished]
+    # 结果为 (设计数, 频点数, 指标数) 数组，图表和汇总表直接由其切片构造
+    with JYProfile.stage("数据表组装", size=len(finished) * len(freqs)):
+        results = np.array([result for _, result in finished]).reshape(len(finished), len(freqs), 3)
+    if complete:
+        log_debug(f"灵敏度、噪声、相位数据 {len(done_names)} 组 × {len(freqs)} 频点，每条曲线显示 {min(points, len(freqs))} 点")
+
+    # 绘制频响曲线：每个指标一个长表和一个图表，各曲线先降采样到点数预算以内
+    with JYProfile.stage("图表构建", size=len(done_names) * points):
+        titles = ["灵敏度（dB）", "噪声谱（dB）", "相位（rad）"]
+        charts = [JYPlot.line_chart(JYPlot.long_frame(freqs, done_names, results[:, :, j], points), done_names, title)
+                  for j, title in enumerate(titles)] if done_names else []
     
     # 绘制曲线
     tab1, tab2, tab3, tab4 = st.tabs(["灵敏度频响曲线", "噪声频谱曲线", "相位频响曲线", "数据汇总"])
-    with tab1:
-        st.altair_chart(alt.layer(*charts_sens))
-    with tab2:
-        st.altair_chart(alt.layer(*charts_noise))
-    with tab3:
-        st.altair_chart(alt.layer(*charts_phase))
+    with JYProfile.stage("图表序列化", size=len(done_names) * points):
+        for tab, chart in zip((tab1, tab2, tab3), charts):
+            with tab:
+                st.altair_chart(chart)
     with tab4:
-        data_all = Sensitivity.merge(Noise, on="Freq", suffixes=("_sens", "_noise"))
-        data_all = data_all.merge(Phase, on="Freq", suffixes=("", "_phase"))
+        data_all = JYStore.to_frame(freqs, done_names, results)
         st.dataframe(data_all)
-        
-    log_debug(f"计算中完成"+time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()))
+    if complete:
+        log_debug(f"计算中完成"+time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()))
+    JYProfile.activate(rec)
+    JYProfile.panel({"页面": rec, "曲线": frag_rec, "后台仿真": job.recorder})
+    JYCache.panel()
+
+with curvebox.container():
+    show_results()
     st.divider()
+# 参数灵敏度分析：由雅可比矩阵给出各参数增加 10% 时曲线的变化量
+with st.expander(":material/tune: 参数灵敏度分析", expanded=False):
+    if paras:
+        col1, col2, col3 = st.columns(3)
+        design = col1.selectbox("设计", names)
+        metric = col2.selectbox("指标", ["灵敏度（dB）", "相位（rad）", "噪声谱（dB）"])
+        f_sel = col3.number_input("频率（Hz）", 10.0, 100000.0, 20000.0)
+        i = names.index(design)
+        J = ac.MIC_jacobian([paras[i]], freqs)[["灵敏度（dB）", "相位（rad）", "噪声谱（dB）"].index(metric)][0]
+        delta = J * np.array(paras[i])[:, None] * 0.1  # (8, 频点数)
+        k = np.argmin(np.abs(freqs - f_sel))
+        tornado = pd.DataFrame({"参数": df.columns, "变化量": delta[:, k], "幅度": np.abs(delta[:, k])})
+        st.altair_chart(alt.Chart(tornado).mark_bar().encode(
+            x=alt.X("变化量:Q", title=f"{freqs[k]:.0f} Hz 处参数增加 10% 时的{metric}变化"),
+            y=alt.Y("参数:N", sort=alt.EncodingSortField(field="幅度", order="descending"), title=None),
+            color=alt.condition("datum.变化量 > 0", alt.value("#3b6291"), alt.value("#943c39")),
+            tooltip=["参数", "变化量"]))
+        # 热图：频率降采样到 100 点，每个矩形覆盖相邻频点的几何中点之间
+        sub = slice(None, None, 10)
+        f_sub = freqs[sub]
+        edges = np.sqrt(f_sub[1:] * f_sub[:-1])
+        f_lo = np.concatenate([[f_sub[0]], edges])
+        f_hi = np.concatenate([edges, [f_sub[-1]]])
+        heat = pd.DataFrame({
+            "参数": np.repeat(df.columns, len(f_sub)),
+            "f_lo": np.tile(f_lo, 8), "f_hi": np.tile(f_hi, 8),
+            "变化量": delta[:, sub].ravel()})
+        st.altair_chart(alt.Chart(heat).mark_rect().encode(
+            x=alt.X("f_lo:Q", scale=alt.Scale(type='log'), title='频率（Hz）'),
+            x2="f_hi:Q",
+            y=alt.Y("参数:N", title=None),
+            color=alt.Color("变化量:Q", scale=alt.Scale(scheme="redblue", domainMid=0, reverse=True), title=metric),
+            tooltip=["参数", "变化量"]))
+if profiler is not None:
+    with open(JYProfile.stop_cprofile(profiler, extra=job.profiles), "rb") as f:
+        st.sidebar.download_button("下载 cProfile 数据", f.read(), file_name="profile.prof",
+                                   help="包含页面脚本线程，以及开启记录后提交的后台仿真任务；输入未变时沿用的旧任务不含在内")
 st.caption("""
 参考文献：
 """)
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
+import numpy as np
 import JYAcoustic as ac
+import JYCache
 st.header("计权数据生成", divider=True)
 freq0 = ""
 for i in range(401): freq0 += str(10**(i/100+1))+"\n"
@@ -19,7 +21,8 @@ for row in indata:
 N = len(data)
 st.caption(f"有效数据长度：{N}")
 freq = [row[0] for row in data]
-values = [ac.A_weight(num) for num in freq]  # 计算计权值
+# 计算计权值，按频点和 JYAcoustic 的代码版本缓存，所有会话共享
+values = JYCache.default().fetch("weight", JYCache.key(freq, JYCache.code_version(ac)), lambda: ac.A_weight(np.array(freq)))
 if len(data[0])==1:
     df = pd.DataFrame({'频率': freq, 'A计权值': values})
     chart = alt.Chart(df).mark_line(point=True).encode(